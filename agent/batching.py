@@ -0,0 +1,72 @@
+# agent/batching.py
+
+import threading
+import time
+from concurrent.futures import Future
+from queue import Queue, Empty
+
+from mylogging.error_logger import error_logger
+from monitoring.metrics import GENERATION_QUEUE_DEPTH, GENERATION_BATCH_SIZE
+
+class BatchScheduler:
+    # Collects items submitted from many threads and hands them to `run_batch`
+    # in groups of up to `max_batch_size`, waiting at most `max_wait_ms` after
+    # the first item arrives. `run_batch` gets a list of items and must return
+    # a list of results in the same order.
+    def __init__(self, run_batch, max_batch_size: int = 8, max_wait_ms: float = 10.0):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue = Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def submit(self, item) -> Future:
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future))
+        GENERATION_QUEUE_DEPTH.set(self._queue.qsize())
+        return future
+
+    def _ensure_worker(self):
+        # Started lazily so forked worker processes get their own thread
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._loop, name="generation-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            GENERATION_QUEUE_DEPTH.set(self._queue.qsize())
+            # Drop callers that gave up while waiting in the queue
+            batch = [(item, f) for item, f in batch if f.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            GENERATION_BATCH_SIZE.observe(len(batch))
+            try:
+                results = self.run_batch([item for item, _ in batch])
+            except Exception as e:
+                error_logger.error("Exception in batch run (%d items): %s", len(batch), str(e))
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
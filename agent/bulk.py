@@ -0,0 +1,185 @@
+# agent/bulk.py
+#
+# Bulk campaign generation over JSONL. Each input line is one campaign in the
+# shape of CampaignRequest (customer_profile, campaign_type, product, offer,
+# optional feedback/max_tokens/temperature/request_id). Output is JSONL with
+# one "result" or "error" record per input line, a "progress" record after
+# every chunk and a final "summary".
+#
+#   python -m agent.bulk customers.jsonl -o campaigns.jsonl
+
+import argparse
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from agent.generation import generate_response
+from agent.optimization import optimize_prompt
+from agent.orchestrator import build_base_prompt
+from agent.segmentation import segment_user
+from monitoring.metrics import CAMPAIGN_CREATED, ERROR_COUNT
+from mylogging.error_logger import error_logger
+from mylogging.research_logger import research_logger
+
+# Rows are processed BULK_CHUNK_SIZE at a time so memory stays flat
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "256"))
+# Concurrent generate_response calls; these feed the batch scheduler
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", os.getenv("GEN_BATCH_MAX_SIZE", "8")))
+
+REQUIRED_FIELDS = ("customer_profile", "campaign_type", "product", "offer")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(1, BULK_CONCURRENCY), thread_name_prefix="bulk-generation"
+                )
+    return _executor
+
+def _parse_row(text) -> dict:
+    row = json.loads(text)
+    if not isinstance(row, dict):
+        raise ValueError("line is not a JSON object")
+    missing = [f for f in REQUIRED_FIELDS if f not in row]
+    if missing:
+        raise ValueError(f"missing fields: {', '.join(missing)}")
+    if not isinstance(row["customer_profile"], dict):
+        raise ValueError("customer_profile must be an object")
+    return row
+
+def _profile_key(profile: dict):
+    interests = profile.get("interests", [])
+    return (profile.get("age", 0), tuple(interests), profile.get("location", ""))
+
+def process_rows(lines: list) -> list:
+    # `lines` is a list of (line_no, text). Returns one record per non-blank line.
+    records = {}
+    rows = []
+    for line_no, text in lines:
+        if not text.strip():
+            continue
+        try:
+            rows.append((line_no, _parse_row(text)))
+        except Exception as e:
+            records[line_no] = {"type": "error", "line": line_no, "error": str(e)}
+
+    # Segmentation and optimization run once per distinct input in the chunk
+    segments_by_profile = {}
+    prompts_by_base = {}
+    jobs = {}
+    row_jobs = []
+    for line_no, row in rows:
+        try:
+            profile = row["customer_profile"]
+            profile_key = _profile_key(profile)
+            if profile_key not in segments_by_profile:
+                segments_by_profile[profile_key] = segment_user(profile)
+            segments = segments_by_profile[profile_key]
+            name = profile.get("name", "Customer")
+            base_prompt = build_base_prompt(
+                name, segments, row["campaign_type"], row["product"], row["offer"]
+            )
+            feedback = row.get("feedback") or {}
+            base_key = (base_prompt, json.dumps(feedback, sort_keys=True))
+            if base_key not in prompts_by_base:
+                prompts_by_base[base_key] = optimize_prompt(base_prompt, feedback)
+            final_prompt = prompts_by_base[base_key]
+            # Identical prompts with identical sampling params share one LLM call
+            job_key = (final_prompt, int(row.get("max_tokens", 100)), float(row.get("temperature", 0.7)))
+            if job_key not in jobs:
+                jobs[job_key] = _get_executor().submit(
+                    generate_response,
+                    prompt=final_prompt,
+                    max_new_tokens=job_key[1],
+                    temperature=job_key[2],
+                    customer_name=name
+                )
+            row_jobs.append((line_no, row, segments, final_prompt, jobs[job_key]))
+        except Exception as e:
+            ERROR_COUNT.inc()
+            error_logger.error("Exception in bulk row %d: %s", line_no, str(e))
+            records[line_no] = {"type": "error", "line": line_no, "error": str(e)}
+
+    for line_no, row, segments, final_prompt, future in row_jobs:
+        try:
+            record = {
+                "type": "result",
+                "line": line_no,
+                "segments": segments,
+                "prompt": final_prompt,
+                "generated_content": future.result(),
+            }
+            if "request_id" in row:
+                record["request_id"] = row["request_id"]
+            CAMPAIGN_CREATED.inc()
+            records[line_no] = record
+        except Exception as e:
+            ERROR_COUNT.inc()
+            error_logger.error("Exception in bulk row %d: %s", line_no, str(e))
+            records[line_no] = {"type": "error", "line": line_no, "error": str(e)}
+
+    research_logger.info(
+        "Bulk chunk: %d rows, %d distinct prompts", len(rows), len(jobs)
+    )
+    return [records[line_no] for line_no in sorted(records)]
+
+class BulkProgress:
+    def __init__(self):
+        self.processed = 0
+        self.failed = 0
+
+    def update(self, records: list) -> dict:
+        self.processed += len(records)
+        self.failed += sum(1 for r in records if r["type"] == "error")
+        return {"type": "progress", "processed": self.processed, "failed": self.failed}
+
+    def summary(self) -> dict:
+        return {"type": "summary", "processed": self.processed, "failed": self.failed}
+
+def iter_chunks(lines, chunk_size: int = BULK_CHUNK_SIZE):
+    chunk = []
+    for line_no, text in enumerate(lines, 1):
+        chunk.append((line_no, text))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def run_bulk(lines):
+    # Lazily yields output records for an iterable of JSONL lines
+    progress = BulkProgress()
+    for chunk in iter_chunks(lines):
+        records = process_rows(chunk)
+        yield from records
+        yield progress.update(records)
+    yield progress.summary()
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate campaigns for a JSONL customer list")
+    parser.add_argument("input", help="JSONL file, or - for stdin")
+    parser.add_argument("-o", "--output", help="Output JSONL file (default: stdout)")
+    args = parser.parse_args()
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    sink = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for record in run_bulk(source):
+            sink.write(json.dumps(record) + "\n")
+            if record["type"] != "result":
+                sink.flush()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+if __name__ == "__main__":
+    main()
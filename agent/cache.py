@@ -0,0 +1,59 @@
+# agent/cache.py
+
+import threading
+import time
+from collections import OrderedDict
+
+class TTLCache:
+    # Thread-safe LRU cache with a size cap and an optional per-entry TTL.
+    # `on_evict(reason)` is called with "size" or "ttl" for every dropped entry.
+    def __init__(self, max_size: int, ttl_seconds: float = None, on_evict=None):
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self.on_evict = on_evict
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self._evicted("ttl")
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self._evicted("size")
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def _evicted(self, reason: str):
+        if self.on_evict is not None:
+            self.on_evict(reason)
+
+_MISSING = object()
@@ -1,65 +1,250 @@
 # agent/generation.py
 
+import os
+import re
+import threading
+import time
 import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
+from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
 from logging import getLogger
+from agent.batching import BatchScheduler
+from agent.cache import TTLCache
+from agent.model_registry import get_model
 from mylogging.error_logger import error_logger
 from mylogging.research_logger import research_logger
-from monitoring.metrics import REQUEST_COUNT, ERROR_COUNT
+from monitoring.metrics import (
+    REQUEST_COUNT, ERROR_COUNT, GENERATION_TOKENS_PER_SECOND,
+    GENERATION_CACHE_HITS, GENERATION_CACHE_MISSES, GENERATION_CACHE_EVICTIONS
+)
+
+# Concurrent prompts are gathered for up to BATCH_MAX_WAIT_MS and run as one
+# padded model.generate call. A max batch size of 1 disables batching.
+BATCH_MAX_SIZE = int(os.getenv("GEN_BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.getenv("GEN_BATCH_MAX_WAIT_MS", "10"))
+# Seconds a stream may wait for the next token before giving up
+STREAM_TOKEN_TIMEOUT = float(os.getenv("GEN_STREAM_TOKEN_TIMEOUT", "60"))
+# Response cache keyed on the normalized prompt and sampling parameters.
+# GEN_CACHE_SIZE=0 disables it. With template-aware keying the customer name
+# is swapped for a placeholder in the key and re-substituted on a hit, so
+# campaigns that differ only by name share one generation.
+CACHE_SIZE = int(os.getenv("GEN_CACHE_SIZE", "1024"))
+CACHE_TTL_SECONDS = float(os.getenv("GEN_CACHE_TTL_SECONDS", "3600"))
+CACHE_TEMPLATE_AWARE = os.getenv("GEN_CACHE_TEMPLATE_AWARE", "1") == "1"
+NAME_PLACEHOLDER = "\x00name\x00"
 
-MODEL_PATH = "./hf_models/phi3/Phi-3-mini-4k-instruct"
-tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH)
-model = AutoModelForCausalLM.from_pretrained(
-    MODEL_PATH,
-    torch_dtype=torch.float16,
-    low_cpu_mem_usage=True,
-    attn_implementation="eager"
+def _generate_batch(requests: list) -> list:
+    # Sampling parameters are per generate() call, so requests are grouped by
+    # (temperature, top_p). Each group runs to its longest max_new_tokens and
+    # every row is cut back to its own budget afterwards; rows are sampled
+    # independently, so the cut row is what a solo run would have produced.
+    loaded = get_model()
+    tokenizer, model = loaded.tokenizer, loaded.model
+    outputs = [None] * len(requests)
+    groups = {}
+    for idx, req in enumerate(requests):
+        groups.setdefault((req["temperature"], req["top_p"]), []).append(idx)
+    for (temperature, top_p), idxs in groups.items():
+        inputs = tokenizer(
+            [requests[i]["prompt"] for i in idxs], return_tensors="pt", padding=True
+        ).to(model.device)
+        start = time.perf_counter()
+        with torch.no_grad():
+            generated = model.generate(
+                **inputs,
+                max_new_tokens=max(requests[i]["max_new_tokens"] for i in idxs),
+                do_sample=True,
+                temperature=temperature,
+                top_p=top_p,
+                eos_token_id=tokenizer.eos_token_id,
+                pad_token_id=tokenizer.pad_token_id
+            )
+        elapsed = time.perf_counter() - start
+        prompt_len = inputs["input_ids"].shape[1]
+        new_tokens = int((generated[:, prompt_len:] != tokenizer.pad_token_id).sum())
+        if elapsed > 0:
+            GENERATION_TOKENS_PER_SECOND.observe(new_tokens / elapsed)
+        for row, i in enumerate(idxs):
+            tokens = generated[row, :prompt_len + requests[i]["max_new_tokens"]]
+            outputs[i] = tokenizer.decode(tokens, skip_special_tokens=True).strip()
+    return outputs
+
+_scheduler = BatchScheduler(_generate_batch, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS)
+_cache = TTLCache(
+    CACHE_SIZE,
+    CACHE_TTL_SECONDS,
+    on_evict=lambda reason: GENERATION_CACHE_EVICTIONS.labels(reason=reason).inc()
 )
-model.eval()
+
+def _name_pattern(customer_name: str):
+    # Names shorter than two characters would match inside ordinary words
+    if not CACHE_TEMPLATE_AWARE or not customer_name or len(customer_name.strip()) < 2:
+        return None
+    return re.compile(r"\b" + re.escape(customer_name.strip()) + r"\b")
+
+def _cache_key(prompt: str, max_new_tokens: int, temperature: float, top_p: float, name_pattern):
+    key_prompt = " ".join(prompt.split())
+    if name_pattern is not None:
+        key_prompt = name_pattern.sub(NAME_PLACEHOLDER, key_prompt)
+    return (key_prompt, max_new_tokens, temperature, top_p)
+
+def _cache_get(key, customer_name: str):
+    if CACHE_SIZE <= 0:
+        return None
+    cached = _cache.get(key)
+    if cached is None:
+        GENERATION_CACHE_MISSES.inc()
+        return None
+    GENERATION_CACHE_HITS.inc()
+    return cached.replace(NAME_PLACEHOLDER, customer_name.strip()) if customer_name else cached
+
+def _cache_put(key, output: str, name_pattern):
+    # Error messages are never cached so a retry gets a fresh generation
+    if CACHE_SIZE <= 0 or output.startswith("[Error]"):
+        return
+    if name_pattern is not None:
+        output = name_pattern.sub(NAME_PLACEHOLDER, output)
+    _cache.set(key, output)
+
+def _run_generation(request: dict) -> str:
+    if BATCH_MAX_SIZE <= 1:
+        return _generate_batch([request])[0]
+    return _scheduler.submit(request).result()
+
+def _check_output(prompt: str, output: str) -> str:
+    # Shared post-generation checks; returns the cleaned output or an error message
+    # Remove echoed prompt if present
+    if output.startswith(prompt.strip()):
+        output = output[len(prompt.strip()):].strip()
+    output_lower = output.lower()
+    meta_starts = [
+        "write", "create", "include", "generate", "describe", "your task",
+        "the prompt should", "you are tasked to"
+    ]
+    if not output or any(output_lower.startswith(p) for p in meta_starts):
+        ERROR_COUNT.inc()
+        error_logger.error("Generated output insufficient or unclear for prompt: %s", prompt)
+        return "[Error] Insufficient or unclear prompt content. Please rephrase or provide more specific details."
+    if len(output) < 25 and output_lower in prompt.strip().lower():
+        ERROR_COUNT.inc()
+        error_logger.error("Generated output too similar to input: %s", prompt)
+        return "[Error] Generated output too similar to input. Add more detail."
+    research_logger.info("Generated response for prompt: %s", prompt)
+    return output
 
 def generate_response(
     prompt: str,
     max_new_tokens: int = 50,
     temperature: float = 0.5,
-    top_p: float = 0.9
+    top_p: float = 0.9,
+    customer_name: str = None
 ) -> str:
+    # customer_name, when given, enables template-aware cache keying
     REQUEST_COUNT.inc()
     if not prompt.strip():
         ERROR_COUNT.inc()
         error_logger.error("Prompt is empty.")
         return "[Error] Prompt is empty. Please provide a meaningful request."
     try:
-        inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+        name_pattern = _name_pattern(customer_name)
+        key = _cache_key(prompt, max_new_tokens, temperature, top_p, name_pattern)
+        cached = _cache_get(key, customer_name)
+        if cached is not None:
+            return cached
+        output = _run_generation({
+            "prompt": prompt,
+            "max_new_tokens": max_new_tokens,
+            "temperature": temperature,
+            "top_p": top_p,
+        })
+        output = _check_output(prompt, output)
+        _cache_put(key, output, name_pattern)
+        return output
+    except Exception as e:
+        ERROR_COUNT.inc()
+        error_logger.error("Exception in generate_response: %s", str(e))
+        return "[Error] Exception during generation."
+
+class _StopOnEvent(StoppingCriteria):
+    # Lets a stream consumer that went away stop generation early
+    def __init__(self, event: threading.Event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.event.is_set()
+
+def _generate_into(model, streamer, stop_event, errors, generate_kwargs):
+    try:
         with torch.no_grad():
-            outputs = model.generate(
+            model.generate(
+                **generate_kwargs,
+                streamer=streamer,
+                stopping_criteria=StoppingCriteriaList([_StopOnEvent(stop_event)])
+            )
+    except Exception as e:
+        errors.append(e)
+        # Unblock the consumer waiting on the streamer
+        streamer.end()
+
+def stream_response(
+    prompt: str,
+    max_new_tokens: int = 50,
+    temperature: float = 0.5,
+    top_p: float = 0.9,
+    customer_name: str = None
+):
+    # Yields ("token", text) as text is decoded, then a single ("done", text)
+    # carrying the same checked output generate_response would have returned.
+    REQUEST_COUNT.inc()
+    if not prompt.strip():
+        ERROR_COUNT.inc()
+        error_logger.error("Prompt is empty.")
+        yield "done", "[Error] Prompt is empty. Please provide a meaningful request."
+        return
+    stop_event = threading.Event()
+    try:
+        name_pattern = _name_pattern(customer_name)
+        key = _cache_key(prompt, max_new_tokens, temperature, top_p, name_pattern)
+        cached = _cache_get(key, customer_name)
+        if cached is not None:
+            yield "token", cached
+            yield "done", cached
+            return
+        loaded = get_model()
+        tokenizer, model = loaded.tokenizer, loaded.model
+        inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+        streamer = TextIteratorStreamer(
+            tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=STREAM_TOKEN_TIMEOUT
+        )
+        errors = []
+        worker = threading.Thread(
+            target=_generate_into,
+            args=(model, streamer, stop_event, errors, dict(
                 **inputs,
                 max_new_tokens=max_new_tokens,
                 do_sample=True,
                 temperature=temperature,
                 top_p=top_p,
-                eos_token_id=tokenizer.eos_token_id
-            )
-        output = tokenizer.decode(outputs[0], skip_special_tokens=True).strip()
-        # Remove echoed prompt if present
-        if output.startswith(prompt.strip()):
-            output = output[len(prompt.strip()):].strip()
-        output_lower = output.lower()
-        meta_starts = [
-            "write", "create", "include", "generate", "describe", "your task",
-            "the prompt should", "you are tasked to"
-        ]
-        if not output or any(output_lower.startswith(p) for p in meta_starts):
-            ERROR_COUNT.inc()
-            error_logger.error("Generated output insufficient or unclear for prompt: %s", prompt)
-            return "[Error] Insufficient or unclear prompt content. Please rephrase or provide more specific details."
-        if len(output) < 25 and output_lower in prompt.strip().lower():
-            ERROR_COUNT.inc()
-            error_logger.error("Generated output too similar to input: %s", prompt)
-            return "[Error] Generated output too similar to input. Add more detail."
-        research_logger.info("Generated response for prompt: %s", prompt)
-        return output
+                eos_token_id=tokenizer.eos_token_id,
+                pad_token_id=tokenizer.pad_token_id
+            )),
+            name="generation-stream",
+            daemon=True
+        )
+        worker.start()
+        chunks = []
+        for text in streamer:
+            if text:
+                chunks.append(text)
+                yield "token", text
+        worker.join()
+        if errors:
+            raise errors[0]
+        output = _check_output(prompt, "".join(chunks).strip())
+        _cache_put(key, output, name_pattern)
+        yield "done", output
     except Exception as e:
         ERROR_COUNT.inc()
-        error_logger.error("Exception in generate_response: %s", str(e))
-        return "[Error] Exception during generation."
-
+        error_logger.error("Exception in stream_response: %s", str(e))
+        yield "done", "[Error] Exception during generation."
+    finally:
+        stop_event.set()
@@ -0,0 +1,106 @@
+# agent/inference_pool.py
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from monitoring.metrics import INFERENCE_IN_FLIGHT, INFERENCE_REJECTED
+
+# Number of generations allowed to run (or wait on the batch scheduler) at once.
+# Keep it >= GEN_BATCH_MAX_SIZE so full batches can form.
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "8"))
+INFERENCE_RETRY_AFTER = int(os.getenv("INFERENCE_RETRY_AFTER", "2"))
+
+class InferencePoolFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("Inference pool is full")
+        self.retry_after = retry_after
+
+class InferencePool:
+    # Runs blocking inference calls on a dedicated thread pool so the event loop
+    # stays free. Admission is non-blocking: when every slot is taken the caller
+    # gets InferencePoolFull immediately instead of an unbounded queue.
+    def __init__(self, max_workers: int, retry_after: int):
+        self.max_workers = max(1, max_workers)
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(self.max_workers)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="inference"
+                    )
+        return self._executor
+
+    def try_acquire(self):
+        if not self._slots.acquire(blocking=False):
+            INFERENCE_REJECTED.inc()
+            raise InferencePoolFull(self.retry_after)
+        INFERENCE_IN_FLIGHT.inc()
+
+    def release(self):
+        INFERENCE_IN_FLIGHT.dec()
+        self._slots.release()
+
+    def _call(self, fn):
+        # The slot is released by the worker thread, not the awaiting coroutine,
+        # so a disconnected client can't free a slot that is still computing.
+        try:
+            return fn()
+        finally:
+            self.release()
+
+    async def run(self, fn, *args, **kwargs):
+        self.try_acquire()
+        try:
+            future = asyncio.get_running_loop().run_in_executor(
+                self._get_executor(), self._call, partial(fn, *args, **kwargs)
+            )
+        except Exception:
+            # Executor refused the job (e.g. shutting down); slot was never used
+            self.release()
+            raise
+        return await future
+
+    def hold(self, iterator):
+        # Admits a streaming generation now and keeps its slot until the
+        # returned iterator is exhausted, closed or garbage collected.
+        self.try_acquire()
+        return _HeldIterator(self, iterator)
+
+class _HeldIterator:
+    def __init__(self, pool: InferencePool, iterator):
+        self._pool = pool
+        self._iterator = iterator
+        self._released = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._iterator)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        try:
+            if hasattr(self._iterator, "close"):
+                self._iterator.close()
+        finally:
+            self._pool.release()
+
+    def __del__(self):
+        self.close()
+
+inference_pool = InferencePool(INFERENCE_WORKERS, INFERENCE_RETRY_AFTER)
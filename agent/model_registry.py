@@ -0,0 +1,183 @@
+# agent/model_registry.py
+
+import os
+import string
+import threading
+import time
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+from mylogging.error_logger import error_logger
+from mylogging.research_logger import research_logger
+from monitoring.metrics import MODEL_LOAD_SECONDS, MODEL_RESIDENT_BYTES
+
+# --- Model config (environment) ---
+# MODEL_BACKEND: "hf" loads MODEL_PATH, "stub" builds a tiny random model in
+# memory so tests and local runs don't need the weights.
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "hf")
+MODEL_PATH = os.getenv("MODEL_PATH", "./hf_models/phi3/Phi-3-mini-4k-instruct")
+# auto | float32 | bfloat16 | float16 | int8 (dynamic int8 quantization of
+# Linear layers). "auto" is float16 on GPU, bfloat16 on CPUs with native bf16
+# kernels and float32 otherwise; fp16 matmuls on CPU are emulated and slow.
+MODEL_DTYPE = os.getenv("MODEL_DTYPE", "auto")
+# sdpa | eager
+MODEL_ATTN_IMPL = os.getenv("MODEL_ATTN_IMPL", "sdpa")
+# 0 keeps torch's default intra-op thread count
+MODEL_NUM_THREADS = int(os.getenv("MODEL_NUM_THREADS", "0"))
+
+DTYPES = {
+    "float32": torch.float32,
+    "bfloat16": torch.bfloat16,
+    "float16": torch.float16,
+}
+
+class LoadedModel:
+    def __init__(self, name: str, tokenizer, model, backend: str, dtype: str,
+                 load_seconds: float, resident_bytes: int):
+        self.name = name
+        self.tokenizer = tokenizer
+        self.model = model
+        self.backend = backend
+        self.dtype = dtype
+        self.load_seconds = load_seconds
+        self.resident_bytes = resident_bytes
+
+# name -> spec dict (backend, path, dtype, attn); models load on first get_model(name)
+_specs = {
+    "main": {"backend": MODEL_BACKEND, "path": MODEL_PATH, "dtype": MODEL_DTYPE, "attn": MODEL_ATTN_IMPL},
+}
+_loaded = {}
+_lock = threading.Lock()
+
+def register_model(name: str, backend: str = "hf", path: str = None, dtype: str = "auto",
+                   attn: str = MODEL_ATTN_IMPL):
+    with _lock:
+        _specs[name] = {"backend": backend, "path": path, "dtype": dtype, "attn": attn}
+        _loaded.pop(name, None)
+
+def unload_model(name: str):
+    with _lock:
+        _loaded.pop(name, None)
+
+def is_loaded(name: str = "main") -> bool:
+    return name in _loaded
+
+def get_model(name: str = "main") -> LoadedModel:
+    loaded = _loaded.get(name)
+    if loaded is not None:
+        return loaded
+    with _lock:
+        if name not in _loaded:
+            if name not in _specs:
+                raise KeyError(f"Unknown model: {name}")
+            _loaded[name] = _load(name, _specs[name])
+        return _loaded[name]
+
+def warm_up(names=("main",)):
+    # Explicit hook for startup so the first request doesn't pay the load
+    for name in names:
+        get_model(name)
+
+def resolve_dtype(dtype: str) -> str:
+    if dtype != "auto":
+        return dtype
+    if torch.cuda.is_available():
+        return "float16"
+    if bf16_supported():
+        return "bfloat16"
+    return "float32"
+
+def bf16_supported() -> bool:
+    # True when oneDNN has native bf16 kernels (AVX512-BF16 / AMX) on this CPU
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+def resident_bytes() -> int:
+    # Current RSS of this process (Linux); falls back to peak RSS elsewhere
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def _load(name: str, spec: dict) -> LoadedModel:
+    if MODEL_NUM_THREADS > 0:
+        torch.set_num_threads(MODEL_NUM_THREADS)
+    dtype = resolve_dtype(spec["dtype"]) if spec["backend"] == "hf" else "float32"
+    rss_before = resident_bytes()
+    start = time.perf_counter()
+    try:
+        if spec["backend"] == "stub":
+            tokenizer, model = _load_stub()
+        elif spec["backend"] == "hf":
+            tokenizer, model = _load_hf(spec["path"], dtype, spec["attn"])
+        else:
+            raise ValueError(f"Unknown model backend: {spec['backend']}")
+    except Exception as e:
+        error_logger.error("Failed to load model %s (%s): %s", name, spec, str(e))
+        raise
+    model.eval()
+    # Left padding keeps every prompt flush against its generated tokens
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    load_seconds = time.perf_counter() - start
+    loaded_bytes = max(0, resident_bytes() - rss_before)
+    MODEL_LOAD_SECONDS.labels(model=name, dtype=dtype).set(load_seconds)
+    MODEL_RESIDENT_BYTES.labels(model=name, dtype=dtype).set(loaded_bytes)
+    research_logger.info(
+        "Loaded model %s backend=%s dtype=%s in %.2fs (+%.0f MiB RSS)",
+        name, spec["backend"], dtype, load_seconds, loaded_bytes / 2**20
+    )
+    return LoadedModel(name, tokenizer, model, spec["backend"], dtype, load_seconds, loaded_bytes)
+
+def _load_hf(path: str, dtype: str, attn: str):
+    tokenizer = AutoTokenizer.from_pretrained(path)
+    if dtype == "int8":
+        # Dynamic quantization runs on fp32 weights; activations stay fp32
+        model = AutoModelForCausalLM.from_pretrained(
+            path, dtype=torch.float32, low_cpu_mem_usage=True, attn_implementation=attn
+        )
+        from torch.ao.quantization import quantize_dynamic
+        model = quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return tokenizer, model
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported MODEL_DTYPE: {dtype}")
+    model = AutoModelForCausalLM.from_pretrained(
+        path,
+        dtype=DTYPES[dtype],
+        low_cpu_mem_usage=True,
+        attn_implementation=attn
+    )
+    return tokenizer, model
+
+def _load_stub():
+    # Character-level tokenizer and a 2-layer GPT-2 with fixed random weights.
+    # Output is gibberish but exercises the same generate() code paths.
+    from tokenizers import Tokenizer, Regex, decoders, models, pre_tokenizers
+    from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+
+    vocab = {"<pad>": 0, "<eos>": 1, "<unk>": 2}
+    for ch in string.printable:
+        vocab.setdefault(ch, len(vocab))
+    backend = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    backend.pre_tokenizer = pre_tokenizers.Split(Regex("."), behavior="isolated")
+    backend.decoder = decoders.Fuse()
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend, pad_token="<pad>", eos_token="<eos>", unk_token="<unk>"
+    )
+    with torch.random.fork_rng():
+        torch.manual_seed(0)
+        model = GPT2LMHeadModel(GPT2Config(
+            vocab_size=len(vocab),
+            n_positions=1024,
+            n_embd=32,
+            n_layer=2,
+            n_head=2,
+            bos_token_id=1,
+            eos_token_id=1,
+            pad_token_id=0,
+        ))
+    return tokenizer, model
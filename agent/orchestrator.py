@@ -7,21 +7,25 @@ from monitoring.metrics import CAMPAIGN_CREATED, ERROR_COUNT
 from mylogging.error_logger import error_logger
 from mylogging.research_logger import research_logger
 
+def build_base_prompt(name: str, segments: list, campaign_type: str, product: str, offer: str) -> str:
+    segment_str = ", ".join(segments) if segments else "valued"
+    return (
+        f"Hi {name}, as a {segment_str} customer, you'll love our {product}! "
+        f"{offer} just for you. This is part of our {campaign_type} campaign."
+    )
+
 def create_campaign(user_profile: dict, campaign_type: str, product: str, offer: str,
                    feedback: dict = None, max_tokens: int = 100, temperature: float = 0.7) -> str:
     try:
         segments = segment_user(user_profile)
         name = user_profile.get("name", "Customer")
-        segment_str = ", ".join(segments) if segments else "valued"
-        base_prompt = (
-            f"Hi {name}, as a {segment_str} customer, you'll love our {product}! "
-            f"{offer} just for you. This is part of our {campaign_type} campaign."
-        )
+        base_prompt = build_base_prompt(name, segments, campaign_type, product, offer)
         final_prompt = optimize_prompt(base_prompt, feedback or {})
         response = generate_response(
             prompt=final_prompt,
             max_new_tokens=max_tokens,
-            temperature=temperature
+            temperature=temperature,
+            customer_name=name
         )
         CAMPAIGN_CREATED.inc()
         research_logger.info("Campaign created for user: %s, prompt: %s", name, final_prompt)
@@ -30,4 +34,3 @@ def create_campaign(user_profile: dict, campaign_type: str, product: str, offer:
         ERROR_COUNT.inc()
         error_logger.error("Exception in create_campaign: %s", str(e))
         return "[Error] Exception during campaign creation."
-
@@ -1,15 +1,22 @@
 from fastapi import FastAPI, Request, Depends, HTTPException, status
-from fastapi.responses import JSONResponse, Response
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.exceptions import RequestValidationError
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from datetime import datetime, timedelta, UTC
+from contextlib import asynccontextmanager
+import json
+import os
 
-from agent.generation import generate_response
+from agent.generation import generate_response, stream_response
 from agent.segmentation import segment_user
 from agent.optimization import optimize_prompt
+from agent.inference_pool import inference_pool, InferencePoolFull
+from agent.model_registry import warm_up
+from agent.bulk import process_rows, BulkProgress, BULK_CHUNK_SIZE
 from monitoring.metrics import REQUEST_COUNT, CAMPAIGN_CREATED, ERROR_COUNT, FEEDBACK_RATING_COUNT
 from mylogging.error_logger import error_logger
 from db.feedback import init_feedback_db, save_feedback, get_all_feedback, get_feedback_rating_counts
@@ -61,15 +68,26 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
     except JWTError:
         raise credentials_exception
 
+# Load the model at startup instead of on the first generation request
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") == "1"
+
 # --- Initialization ---
 init_feedback_db()
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if MODEL_WARMUP:
+        warm_up()
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 # --- Pydantic Models ---
 class PromptRequest(BaseModel):
     prompt: str
     max_tokens: int = 256
     temperature: float = 0.7
+    stream: bool = False
 
 class StructuredGenRequest(BaseModel):
     customer_name: str
@@ -79,6 +97,7 @@ class StructuredGenRequest(BaseModel):
     offer: str
     max_tokens: int = 100
     temperature: float = 0.7
+    stream: bool = False
 
 class SegmentRequest(BaseModel):
     age: int = 0
@@ -108,6 +127,14 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         content={"detail": exc.errors()},
     )
 
+@app.exception_handler(InferencePoolFull)
+async def inference_pool_full_handler(request: Request, exc: InferencePoolFull):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Generation capacity exhausted, please retry later."},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 @app.exception_handler(Exception)
 async def generic_exception_handler(request: Request, exc: Exception):
     ERROR_COUNT.inc()
@@ -117,6 +144,31 @@ async def generic_exception_handler(request: Request, exc: Exception):
         content={"detail": "Internal server error"},
     )
 
+# --- Server-Sent Events streaming ---
+def sse_events(events, result_key: str):
+    # "token" events carry partial text; the final "done" event carries the
+    # checked output under the same key the non-streaming endpoint uses.
+    try:
+        for kind, text in events:
+            payload = {"token": text} if kind == "token" else {result_key: text}
+            yield f"event: {kind}\ndata: {json.dumps(payload)}\n\n"
+    finally:
+        events.close()
+
+def stream_generation(prompt: str, max_tokens: int, temperature: float, result_key: str,
+                      customer_name: str = None):
+    events = inference_pool.hold(stream_response(
+        prompt=prompt,
+        max_new_tokens=max_tokens,
+        temperature=temperature,
+        customer_name=customer_name
+    ))
+    return StreamingResponse(
+        sse_events(events, result_key),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
 # --- Endpoints ---
 @app.get("/")
 def read_root():
@@ -125,13 +177,20 @@ def read_root():
 @app.post("/generate")
 async def generate(prompt_request: PromptRequest):
     REQUEST_COUNT.inc()
+    if prompt_request.stream:
+        return stream_generation(
+            prompt_request.prompt, prompt_request.max_tokens, prompt_request.temperature, "response"
+        )
     try:
-        output = generate_response(
+        output = await inference_pool.run(
+            generate_response,
             prompt=prompt_request.prompt,
             max_new_tokens=prompt_request.max_tokens,
             temperature=prompt_request.temperature
         )
         return {"response": output}
+    except InferencePoolFull:
+        raise
     except Exception as e:
         ERROR_COUNT.inc()
         error_logger.error("Error in /generate: %s", str(e))
@@ -145,12 +204,20 @@ async def generate_structured(req: StructuredGenRequest):
             f"Hi {req.customer_name}, as a {', '.join(req.segments)} customer, "
             f"you'll love our {req.product}! {req.offer} just for you."
         )
-        output = generate_response(
+        if req.stream:
+            return stream_generation(
+                prompt, req.max_tokens, req.temperature, "generated_content", req.customer_name
+            )
+        output = await inference_pool.run(
+            generate_response,
             prompt=prompt,
             max_new_tokens=req.max_tokens,
-            temperature=req.temperature
+            temperature=req.temperature,
+            customer_name=req.customer_name
         )
         return {"generated_content": output}
+    except InferencePoolFull:
+        raise
     except Exception as e:
         ERROR_COUNT.inc()
         error_logger.error("Error in /generate-content: %s", str(e))
@@ -216,6 +283,41 @@ def optimize(req: OptimizationRequest):
         error_logger.error("Error in /optimize: %s", str(e))
         return {"error": "Internal server error."}
 
+# --- Bulk campaign generation (JSONL in, JSONL out) ---
+async def request_lines(request: Request):
+    # Splits the request body into lines as it arrives
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8")
+    if buffer:
+        yield buffer.decode("utf-8")
+
+async def bulk_records(request: Request):
+    progress = BulkProgress()
+    chunk = []
+    line_no = 0
+    async for line in request_lines(request):
+        line_no += 1
+        chunk.append((line_no, line))
+        if len(chunk) >= BULK_CHUNK_SIZE:
+            records = await run_in_threadpool(process_rows, chunk)
+            chunk = []
+            for record in records + [progress.update(records)]:
+                yield json.dumps(record) + "\n"
+    if chunk:
+        records = await run_in_threadpool(process_rows, chunk)
+        for record in records + [progress.update(records)]:
+            yield json.dumps(record) + "\n"
+    yield json.dumps(progress.summary()) + "\n"
+
+@app.post("/bulk-campaigns")
+async def bulk_campaigns(request: Request, username: str = Depends(get_current_user)):
+    REQUEST_COUNT.inc()
+    return StreamingResponse(bulk_records(request), media_type="application/x-ndjson")
+
 # --- Prometheus metrics endpoint ---
 @app.get("/metrics")
 def metrics():
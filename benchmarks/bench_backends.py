@@ -0,0 +1,84 @@
+# benchmarks/bench_backends.py
+#
+# Compare inference backends on this machine:
+#   python -m benchmarks.bench_backends --dtypes float32,bfloat16,int8 --attn sdpa
+# Pick the winner per deployment with MODEL_DTYPE / MODEL_ATTN_IMPL.
+
+import argparse
+import gc
+import json
+import time
+import torch
+
+from agent.model_registry import MODEL_PATH, get_model, register_model, unload_model
+
+PROMPTS = [
+    "Hi Alex, as a Tech Savvy customer, you'll love our SmartHome Hub! Free shipping just for you.",
+    "Hi Priya, as a Fitness Enthusiast customer, you'll love our Running Shoes! 20% off just for you.",
+    "Hi Sam, as a Book Lover customer, you'll love our E-Reader! Buy one get one free just for you.",
+]
+
+def bench_backend(backend: str, path: str, dtype: str, attn: str, runs: int, max_new_tokens: int) -> dict:
+    name = f"bench-{dtype}-{attn}"
+    register_model(name, backend=backend, path=path, dtype=dtype, attn=attn)
+    loaded = get_model(name)
+    tokenizer, model = loaded.tokenizer, loaded.model
+    # One untimed pass so lazy kernel init doesn't count against the backend
+    _generate(tokenizer, model, PROMPTS[0], max_new_tokens)
+    tokens = 0
+    elapsed = 0.0
+    for i in range(runs):
+        start = time.perf_counter()
+        tokens += _generate(tokenizer, model, PROMPTS[i % len(PROMPTS)], max_new_tokens)
+        elapsed += time.perf_counter() - start
+    result = {
+        "dtype": loaded.dtype,
+        "attn": attn,
+        "load_seconds": round(loaded.load_seconds, 3),
+        "resident_mib": round(loaded.resident_bytes / 2**20, 1),
+        "tokens_per_second": round(tokens / elapsed, 2) if elapsed else None,
+        "runs": runs,
+        "max_new_tokens": max_new_tokens,
+    }
+    unload_model(name)
+    del loaded, tokenizer, model
+    gc.collect()
+    return result
+
+def _generate(tokenizer, model, prompt: str, max_new_tokens: int) -> int:
+    inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+    with torch.no_grad():
+        output = model.generate(
+            **inputs,
+            max_new_tokens=max_new_tokens,
+            min_new_tokens=max_new_tokens,
+            do_sample=False,
+            pad_token_id=tokenizer.pad_token_id
+        )
+    return output.shape[1] - inputs["input_ids"].shape[1]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark model inference backends")
+    parser.add_argument("--backend", default="hf", choices=["hf", "stub"])
+    parser.add_argument("--path", default=MODEL_PATH)
+    parser.add_argument("--dtypes", default="float32,bfloat16,int8")
+    parser.add_argument("--attn", default="sdpa")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    for dtype in args.dtypes.split(","):
+        for attn in args.attn.split(","):
+            result = bench_backend(args.backend, args.path, dtype.strip(), attn.strip(),
+                                   args.runs, args.max_new_tokens)
+            results.append(result)
+            print(f"{result['dtype']:>9} {result['attn']:>6}  load {result['load_seconds']:>7.2f}s  "
+                  f"rss +{result['resident_mib']:>8.1f} MiB  {result['tokens_per_second']} tok/s")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"torch_threads": torch.get_num_threads(), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@
 
 from prometheus_client import Gauge
 from prometheus_client import Counter
+from prometheus_client import Histogram
 
 REQUEST_COUNT = Counter('request_count', 'Total number of requests')
 ERROR_COUNT = Counter('error_count', 'Number of errors occurred')
@@ -14,3 +15,55 @@ FEEDBACK_RATING_COUNT = Gauge(
     ["rating"]
 )
 
+# --- Generation batching ---
+GENERATION_QUEUE_DEPTH = Gauge(
+    "generation_queue_depth",
+    "Prompts waiting for the generation batch scheduler"
+)
+GENERATION_BATCH_SIZE = Histogram(
+    "generation_batch_size",
+    "Number of prompts per batched model.generate call",
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+
+# --- Inference executor ---
+INFERENCE_IN_FLIGHT = Gauge(
+    "inference_in_flight",
+    "Generations currently holding an inference pool slot"
+)
+INFERENCE_REJECTED = Counter(
+    "inference_rejected",
+    "Generation requests rejected because the inference pool was full"
+)
+
+# --- Model backends ---
+MODEL_LOAD_SECONDS = Gauge(
+    "model_load_seconds",
+    "Wall time spent loading a model",
+    ["model", "dtype"]
+)
+MODEL_RESIDENT_BYTES = Gauge(
+    "model_resident_bytes",
+    "Resident memory added by loading a model",
+    ["model", "dtype"]
+)
+GENERATION_TOKENS_PER_SECOND = Histogram(
+    "generation_tokens_per_second",
+    "Generated tokens per second of model.generate wall time",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+
+# --- Generation cache ---
+GENERATION_CACHE_HITS = Counter(
+    "generation_cache_hits",
+    "Generations served from the response cache"
+)
+GENERATION_CACHE_MISSES = Counter(
+    "generation_cache_misses",
+    "Generations that missed the response cache"
+)
+GENERATION_CACHE_EVICTIONS = Counter(
+    "generation_cache_evictions",
+    "Entries dropped from the response cache",
+    ["reason"]
+)
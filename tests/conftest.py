@@ -0,0 +1,4 @@
+import os
+
+# Use the in-memory stub model so the suite runs without the Phi-3 weights
+os.environ.setdefault("MODEL_BACKEND", "stub")
@@ -0,0 +1,38 @@
+import time
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from agent.cache import TTLCache
+from agent import generation
+
+
+def test_lru_eviction():
+    evicted = []
+    cache = TTLCache(2, on_evict=evicted.append)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert evicted == ["size"]
+
+def test_ttl_expiry():
+    cache = TTLCache(10, ttl_seconds=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+
+def test_template_aware_cache(monkeypatch):
+    calls = []
+    def fake_run(request):
+        calls.append(request["prompt"])
+        return "Great news, Alice: our Shoes are waiting for you with free shipping!"
+    monkeypatch.setattr(generation, "_run_generation", fake_run)
+    generation._cache.clear()
+
+    first = generation.generate_response("Hi Alice, you'll love our Shoes!", customer_name="Alice")
+    second = generation.generate_response("Hi Bob, you'll love our Shoes!", customer_name="Bob")
+    assert len(calls) == 1
+    assert "Alice" in first
+    assert "Bob" in second and "Alice" not in second
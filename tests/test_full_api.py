@@ -2,6 +2,7 @@ import pytest
 from fastapi.testclient import TestClient
 import sys
 import os
+import json
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from app import app  # Adjust import if your app is in a different module
 
@@ -125,3 +126,26 @@ def test_invalid_token():
         headers={"Authorization": "Bearer invalidtoken"}
     )
     assert response.status_code in (401, 403)
+
+def test_bulk_campaigns():
+    token = get_token()
+    rows = [
+        {"request_id": "a", "customer_profile": {"name": USERNAME, "age": 30, "interests": ["Tech"]},
+         "campaign_type": "email", "product": "Shoes", "offer": "50% off", "max_tokens": 8},
+        {"request_id": "b", "customer_profile": {"name": USERNAME, "age": 30, "interests": ["Tech"]},
+         "campaign_type": "email", "product": "Shoes", "offer": "50% off", "max_tokens": 8},
+        {"customer_profile": {"name": USERNAME}},
+    ]
+    body = "\n".join(json.dumps(r) for r in rows) + "\nnot json\n"
+    response = client.post(
+        "/bulk-campaigns",
+        content=body,
+        headers={"Authorization": f"Bearer {token}", "Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    records = [json.loads(line) for line in response.text.splitlines()]
+    results = [r for r in records if r["type"] == "result"]
+    errors = [r for r in records if r["type"] == "error"]
+    assert [r["request_id"] for r in results] == ["a", "b"]
+    assert [r["line"] for r in errors] == [3, 4]
+    assert records[-1] == {"type": "summary", "processed": 4, "failed": 2}